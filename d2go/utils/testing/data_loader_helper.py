@@ -3,6 +3,7 @@
 
 
 import contextlib
+import io
 import itertools
 import json
 import math
@@ -183,6 +184,11 @@ class LocalImageGenerator:
         self._width = width
         self._height = height
         self._image_dir = image_dir
+        # all toy images are the same blank image, so encode it once here and
+        # have prepare_image only write the bytes, no per-image allocation/encode
+        buf = io.BytesIO()
+        Image.new("RGB", (width, height)).save(buf, format="JPEG")
+        self._encoded_image = buf.getvalue()
 
     def get_image_dir(self):
         return self._image_dir
@@ -196,8 +202,9 @@ class LocalImageGenerator:
         }
 
     def prepare_image(self, i):
-        image = Image.new("RGB", (self._width, self._height))
-        image.save(os.path.join(self._image_dir, self.get_image_dict(i)["file_name"]))
+        file_name = os.path.join(self._image_dir, self.get_image_dict(i)["file_name"])
+        with open(file_name, "wb") as f:
+            f.write(self._encoded_image)
 
 
 @contextlib.contextmanager
@@ -1,10 +1,12 @@
 #!/usr/bin/env python3
 # Copyright (c) Facebook, Inc. and its affiliates. All Rights Reserved
 
-import copy
 import json
 import os
+import shutil
+import tempfile
 import unittest
+from pathlib import Path
 
 import d2go.data.extended_coco as extended_coco
 from d2go.data.keypoint_metadata_registry import (
@@ -22,28 +24,78 @@ from d2go.utils.testing.data_loader_helper import (
     LocalImageGenerator,
     create_toy_dataset,
 )
-from d2go.utils.testing.helper import tempdir
 from detectron2.data import DatasetCatalog, MetadataCatalog
 from mobile_cv.common.misc.file_utils import make_temp_directory
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _dump_json(obj, json_file):
+    if orjson is None:
+        with open(json_file, "w") as f:
+            json.dump(obj, f)
+        return
+    # OPT_NON_STR_KEYS stringifies int keys, same as json.dump
+    Path(json_file).write_bytes(orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS))
+
 
 def create_test_images_and_dataset_json(data_dir, num_images=10, num_classes=-1):
     # create image and json
     image_dir = os.path.join(data_dir, "images")
-    os.makedirs(image_dir)
+    Path(image_dir).mkdir(parents=True)
     json_dataset, meta_data = create_toy_dataset(
         LocalImageGenerator(image_dir, width=80, height=60),
         num_images=num_images,
         num_classes=num_classes,
     )
     json_file = os.path.join(data_dir, "{}.json".format("inj_ds1"))
-    with open(json_file, "w") as f:
-        json.dump(json_dataset, f)
+    _dump_json(json_dataset, json_file)
 
     return image_dir, json_file
 
 
 class TestD2GoDatasets(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # None of the tests modify the toy datasets, build them once and share;
+        # keep them on tmpfs when available since nothing here benchmarks disk
+        cls._shared_tmp = tempfile.mkdtemp(
+            prefix="detectron2go_tmp_dataset",
+            dir="/dev/shm" if os.path.isdir("/dev/shm") else None,
+        )
+        cls.addClassCleanup(shutil.rmtree, cls._shared_tmp, ignore_errors=True)
+        cls._default_dataset = create_test_images_and_dataset_json(
+            os.path.join(cls._shared_tmp, "default")
+        )
+        cls._two_classes_dataset = create_test_images_and_dataset_json(
+            os.path.join(cls._shared_tmp, "two_classes"), num_classes=2
+        )
+        cls._runner = Detectron2GoRunner()
+        cls._base_cfg = cls._runner.get_default_cfg()
+
+    def setUp(self):
+        self._registered_names = []
+        self._adhoc_datasets = []
+
+    def tearDown(self):
+        # only drop what this test put into the global catalogs
+        for adhoc_ds in self._adhoc_datasets:
+            AdhocDatasetManager.remove(adhoc_ds)
+        for name in self._registered_names:
+            DatasetCatalog.pop(name, None)
+            MetadataCatalog.pop(name, None)
+
+    def _register(self, cfg):
+        self._registered_names.extend(cfg.D2GO_DATA.DATASETS.COCO_INJECTION.NAMES)
+        self._runner.register(cfg)
+
+    def _add_adhoc_dataset(self, adhoc_ds):
+        self._adhoc_datasets.append(adhoc_ds)
+        AdhocDatasetManager.add(adhoc_ds)
+
     def test_coco_conversions(self):
         test_data_0 = {
             "info": {},
@@ -59,19 +111,27 @@ class TestD2GoDatasets(unittest.TestCase):
             "imgToAnns": {"img_1": [0]},
             "cats": {},
         }
-        test_data_1 = copy.deepcopy(test_data_0)
-        test_data_1["imgs"][123] = test_data_1["imgs"].pop("img_1")
-        test_data_1["imgs"][123]["id"] = 123
-        test_data_1["anns"][0]["image_id"] = 123
-        test_data_1["imgToAnns"][123] = test_data_1["imgToAnns"].pop("img_1")
+        test_data_1 = {
+            "info": {},
+            "imgs": {
+                123: {
+                    "file_name": "0.jpg",
+                    "width": 600,
+                    "height": 600,
+                    "id": 123,
+                }
+            },
+            "anns": {0: {"id": 0, "image_id": 123, "bbox": [30, 30, 60, 20]}},
+            "imgToAnns": {123: [0]},
+            "cats": {},
+        }
 
         for test_data, exp_output in [(test_data_0, [0, 0]), (test_data_1, [123, 123])]:
             with make_temp_directory("detectron2go_tmp_dataset") as tmp_dir:
                 src_json = os.path.join(tmp_dir, "source.json")
                 out_json = os.path.join(tmp_dir, "output.json")
 
-                with open(src_json, "w") as h_in:
-                    json.dump(test_data, h_in)
+                _dump_json(test_data, src_json)
 
                 out_json = extended_coco.convert_coco_text_to_coco_detection_json(
                     src_json, out_json
@@ -148,60 +208,50 @@ class TestD2GoDatasets(unittest.TestCase):
         )
         self.assertEqual(len(out_dict_list), 1)
 
-    @tempdir
-    def test_coco_injection(self, tmp_dir):
-        image_dir, json_file = create_test_images_and_dataset_json(tmp_dir)
+    def test_coco_injection(self):
+        image_dir, json_file = self._default_dataset
 
-        runner = Detectron2GoRunner()
-        cfg = runner.get_default_cfg()
+        cfg = self._base_cfg.clone()
         cfg.merge_from_list(
             [
-                str(x)
-                for x in [
-                    "D2GO_DATA.DATASETS.COCO_INJECTION.NAMES",
-                    ["inj_ds1", "inj_ds2"],
-                    "D2GO_DATA.DATASETS.COCO_INJECTION.IM_DIRS",
-                    [image_dir, "/mnt/fair"],
-                    "D2GO_DATA.DATASETS.COCO_INJECTION.JSON_FILES",
-                    [json_file, "inj_ds2"],
-                ]
+                "D2GO_DATA.DATASETS.COCO_INJECTION.NAMES",
+                ["inj_ds1", "inj_ds2"],
+                "D2GO_DATA.DATASETS.COCO_INJECTION.IM_DIRS",
+                [image_dir, "/mnt/fair"],
+                "D2GO_DATA.DATASETS.COCO_INJECTION.JSON_FILES",
+                [json_file, "inj_ds2"],
             ]
         )
 
-        runner.register(cfg)
+        self._register(cfg)
         inj_ds1 = DatasetCatalog.get("inj_ds1")
         self.assertEqual(len(inj_ds1), 10)
         for dic in inj_ds1:
             self.assertEqual(dic["width"], 80)
             self.assertEqual(dic["height"], 60)
 
-    @tempdir
-    def test_sub_dataset(self, tmp_dir):
-        image_dir, json_file = create_test_images_and_dataset_json(tmp_dir)
+    def test_sub_dataset(self):
+        image_dir, json_file = self._default_dataset
 
-        runner = Detectron2GoRunner()
-        cfg = runner.get_default_cfg()
+        cfg = self._base_cfg.clone()
         cfg.merge_from_list(
             [
-                str(x)
-                for x in [
-                    "D2GO_DATA.DATASETS.COCO_INJECTION.NAMES",
-                    ["inj_ds3"],
-                    "D2GO_DATA.DATASETS.COCO_INJECTION.IM_DIRS",
-                    [image_dir],
-                    "D2GO_DATA.DATASETS.COCO_INJECTION.JSON_FILES",
-                    [json_file],
-                    "DATASETS.TEST",
-                    ("inj_ds3",),
-                    "D2GO_DATA.TEST.MAX_IMAGES",
-                    1,
-                ]
+                "D2GO_DATA.DATASETS.COCO_INJECTION.NAMES",
+                ["inj_ds3"],
+                "D2GO_DATA.DATASETS.COCO_INJECTION.IM_DIRS",
+                [image_dir],
+                "D2GO_DATA.DATASETS.COCO_INJECTION.JSON_FILES",
+                [json_file],
+                "DATASETS.TEST",
+                ("inj_ds3",),
+                "D2GO_DATA.TEST.MAX_IMAGES",
+                1,
             ]
         )
 
-        runner.register(cfg)
+        self._register(cfg)
         with maybe_subsample_n_images(cfg) as new_cfg:
-            test_loader = runner.build_detection_test_loader(
+            test_loader = self._runner.build_detection_test_loader(
                 new_cfg, new_cfg.DATASETS.TEST[0]
             )
             self.assertEqual(len(test_loader), 1)
@@ -226,8 +276,7 @@ class TestD2GoDatasets(unittest.TestCase):
         self.assertEqual(tri_md["keypoint_flip_map"][0][0], "A")
         self.assertEqual(tri_md["keypoint_connection_rules"][0][0], "A")
 
-    @tempdir
-    def test_coco_metadata_register(self, tmp_dir):
+    def test_coco_metadata_register(self):
         @KEYPOINT_METADATA_REGISTRY.register()
         def LineMetadata():
             return KeypointMetadata(
@@ -238,61 +287,51 @@ class TestD2GoDatasets(unittest.TestCase):
                 ],
             )
 
-        image_dir, json_file = create_test_images_and_dataset_json(tmp_dir)
+        image_dir, json_file = self._default_dataset
 
-        runner = Detectron2GoRunner()
-        cfg = runner.get_default_cfg()
+        cfg = self._base_cfg.clone()
         cfg.merge_from_list(
             [
-                str(x)
-                for x in [
-                    "D2GO_DATA.DATASETS.COCO_INJECTION.NAMES",
-                    ["inj_ds"],
-                    "D2GO_DATA.DATASETS.COCO_INJECTION.IM_DIRS",
-                    [image_dir],
-                    "D2GO_DATA.DATASETS.COCO_INJECTION.JSON_FILES",
-                    [json_file],
-                    "D2GO_DATA.DATASETS.COCO_INJECTION.KEYPOINT_METADATA",
-                    ["LineMetadata"],
-                ]
+                "D2GO_DATA.DATASETS.COCO_INJECTION.NAMES",
+                ["inj_ds"],
+                "D2GO_DATA.DATASETS.COCO_INJECTION.IM_DIRS",
+                [image_dir],
+                "D2GO_DATA.DATASETS.COCO_INJECTION.JSON_FILES",
+                [json_file],
+                "D2GO_DATA.DATASETS.COCO_INJECTION.KEYPOINT_METADATA",
+                ["LineMetadata"],
             ]
         )
-        runner.register(cfg)
+        self._register(cfg)
         inj_md = MetadataCatalog.get("inj_ds")
         self.assertEqual(inj_md.keypoint_names[0], "A")
         self.assertEqual(inj_md.keypoint_flip_map[0][0], "A")
         self.assertEqual(inj_md.keypoint_connection_rules[0][0], "A")
 
-    @tempdir
-    def test_coco_create_adhoc_class_to_use_dataset(self, tmp_dir):
+    def test_coco_create_adhoc_class_to_use_dataset(self):
+        image_dir, json_file = self._two_classes_dataset
 
-        image_dir, json_file = create_test_images_and_dataset_json(
-            tmp_dir, num_classes=2
-        )
-
-        runner = Detectron2GoRunner()
-        cfg = runner.get_default_cfg()
+        cfg = self._base_cfg.clone()
         cfg.merge_from_list(
             [
-                str(x)
-                for x in [
-                    "D2GO_DATA.DATASETS.COCO_INJECTION.NAMES",
-                    ["test_adhoc_ds", "test_adhoc_ds2"],
-                    "D2GO_DATA.DATASETS.COCO_INJECTION.IM_DIRS",
-                    [image_dir, image_dir],
-                    "D2GO_DATA.DATASETS.COCO_INJECTION.JSON_FILES",
-                    [json_file, json_file],
-                ]
+                "D2GO_DATA.DATASETS.COCO_INJECTION.NAMES",
+                ["test_adhoc_ds", "test_adhoc_ds2"],
+                "D2GO_DATA.DATASETS.COCO_INJECTION.IM_DIRS",
+                [image_dir, image_dir],
+                "D2GO_DATA.DATASETS.COCO_INJECTION.JSON_FILES",
+                [json_file, json_file],
             ]
         )
-        runner.register(cfg)
+        self._register(cfg)
 
         # Test adhoc classes to use
-        AdhocDatasetManager.add(COCOWithClassesToUse("test_adhoc_ds", ["class_0"]))
+        self._add_adhoc_dataset(COCOWithClassesToUse("test_adhoc_ds", ["class_0"]))
         ds_list = DatasetCatalog.get("test_adhoc_ds@1classes")
         self.assertEqual(len(ds_list), 5)
 
         # Test adhoc classes to use with suffix removal
-        AdhocDatasetManager.add(COCOWithClassesToUse("test_adhoc_ds2@1classes", ["class_0"]))
+        self._add_adhoc_dataset(
+            COCOWithClassesToUse("test_adhoc_ds2@1classes", ["class_0"])
+        )
         ds_list = DatasetCatalog.get("test_adhoc_ds2@1classes")
         self.assertEqual(len(ds_list), 5)